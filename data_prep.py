@@ -1,6 +1,186 @@
-import json
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
 from pathlib import Path
+import numpy as np
+import orjson
 import pandas as pd
+from pandas.errors import EmptyDataError
+from pandas.io.parsers import TextParser
+from python_calamine import CalamineWorkbook
+
+
+# strings pandas.read_excel treats as missing by default
+_NA_STRINGS = frozenset({
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan",
+    "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None",
+    "n/a", "nan", "null",
+})
+
+
+def _excel_cell(v):
+    """Convert a calamine cell as pandas' calamine reader does (whole floats -> int)."""
+    if isinstance(v, float) and v.is_integer():
+        return int(v)
+    return v
+
+
+def _read_sheet_cells(path: Path) -> list:
+    """
+    Return the cells of the first sheet as a list of rows, exactly as
+    pd.read_excel(engine="calamine") receives them (blank cells -> "").
+
+    Sheets are parsed with the Rust-based calamine reader, which handles
+    .xls and .xlsx alike and is much faster than openpyxl/xlrd.
+    """
+    wb = CalamineWorkbook.from_path(str(path))
+    sheet = wb.get_sheet_by_index(0)
+    return [[_excel_cell(v) for v in r] for r in sheet.to_python(skip_empty_area=False)]
+
+
+def _read_sheet_rows(path: Path) -> list:
+    """
+    Return the cell values of the first sheet as a list of rows, with
+    blank cells and the strings pandas reads as missing turned into None.
+    """
+    rows = [
+        [None if isinstance(v, str) and v in _NA_STRINGS else v for v in r]
+        for r in _read_sheet_cells(path)
+    ]
+
+    # drop trailing empty rows, as pandas does
+    while rows and all(v is None for v in rows[-1]):
+        rows.pop()
+    return rows
+
+
+def _rows_to_array(rows: list) -> np.ndarray:
+    """Pack (possibly ragged) rows into a 2-D object array padded with None."""
+    width = max((len(r) for r in rows), default=0)
+    arr = np.full((len(rows), width), None, dtype=object)
+    for i, r in enumerate(rows):
+        arr[i, :len(r)] = r
+    return arr
+
+
+def _frame_from_rows(cells: list, header_idx: int) -> pd.DataFrame:
+    """
+    Build a DataFrame from the sheet cells below `header_idx`, using that row
+    as header. The cells go through the same TextParser pd.read_excel uses,
+    so header naming ("Unnamed: 3", "X.1"), missing values and column dtypes
+    match a read_excel(header=header_idx) call.
+    """
+    try:
+        return TextParser(cells[header_idx:], header=0, skip_blank_lines=False).read()
+    except EmptyDataError:
+        return pd.DataFrame()
+
+
+def _blank(a: np.ndarray) -> np.ndarray:
+    """Mask of cells that are NaN/None or whitespace-only."""
+    return pd.isna(a) | (np.char.strip(a.astype(str)) == "")
+
+
+def _clean_str_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Return df as stripped strings, with NaN cells turned into ""."""
+    return df.fillna("").astype(str).apply(lambda s: s.str.strip())
+
+
+def _dumps_json(obj) -> bytes:
+    """Serialize obj as indented UTF-8 JSON bytes."""
+    return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS, default=str)
+
+
+def _write_bytes(path: Path, payload: bytes) -> Path:
+    path.write_bytes(payload)
+    return path
+
+
+def _convert_files(worker, paths, out_dir: Path):
+    """
+    Run `worker(path, out_dir)` for every path in a process pool.
+
+    Workers return (out_path, payload_bytes), or None for a skipped file.
+    Payloads are handed to a small writer thread pool as they arrive, so
+    disk writes overlap with the remaining parses. Each written path is
+    yielded as soon as its write finishes.
+    """
+    with ProcessPoolExecutor() as ex, ThreadPoolExecutor(max_workers=2) as writer:
+        parses = {ex.submit(worker, p, out_dir) for p in paths}
+        writes = set()
+        while parses or writes:
+            done, _ = wait(parses | writes, return_when=FIRST_COMPLETED)
+            for fut in done:
+                if fut in parses:
+                    parses.discard(fut)
+                    result = fut.result()
+                    if result is not None:
+                        writes.add(writer.submit(_write_bytes, *result))
+                else:
+                    writes.discard(fut)
+                    yield fut.result()
+
+
+def _allele_json_payload(xls_path: Path, out_dir: Path):
+    # plain object array (blank cells -> None) so the loops below avoid .iloc lookups
+    arr = _rows_to_array(_read_sheet_rows(xls_path))
+    # whitespace-only cells count as blank too; mask the whole sheet in one pass
+    blank = _blank(arr)
+    arr[blank] = None
+    allele_dict = {}
+
+    # first column as stripped, lower-cased strings (blank cells -> "")
+    if arr.size:
+        col0 = np.char.lower(np.char.strip(arr[:, 0].astype(str)))
+        col0[blank[:, 0]] = ""
+    else:  # empty sheet
+        col0 = np.array([], dtype=str)
+
+    # ---------- find rsID row ----------
+    matches = np.flatnonzero(col0 == "rsid")
+    rsid_row_idx = int(matches[0]) if matches.size else None
+
+    if rsid_row_idx is None:
+        print(f"⚠️ No rsID row in {xls_path.name} — skipping file")
+        return None
+
+    # ---------- find reference row (first usable row after rsID) ----------
+    # skips blank rows and the "<GENE> Allele" label row
+    usable = (
+        (np.arange(len(col0)) > rsid_row_idx)
+        & (col0 != "")
+        & ~np.char.endswith(col0, "allele")
+    )
+    candidates = np.flatnonzero(usable)
+    ref_row_idx = int(candidates[0]) if candidates.size else None
+
+    # ---------- fill blanks in rows from the reference row onward ----------
+    # one broadcast over the whole block; ref_values is a view into arr
+    if ref_row_idx is not None:
+        ref_values = arr[ref_row_idx, 1:]
+        block = arr[ref_row_idx:, 1:]
+        block[...] = np.where(blank[ref_row_idx:, 1:], ref_values, block)
+
+    # ---------- build dictionary ----------
+    # col0 already holds the stripped, lower-cased keys; str is bound
+    # locally since it is the only per-row call left
+    _str = str
+    for i, lkey in enumerate(col0.tolist()):
+        if not lkey:
+            continue
+
+        # skip gene title row like "Gene:CYP2C9" or "Gene:VKORC1"
+        if lkey.startswith("gene:"):
+            continue
+
+        # skip "<GENE> Allele" label row
+        if lkey.endswith("allele"):
+            continue
+
+        # rsID row, rows above it (Common Name, Effect on protein, etc.)
+        # and the already-filled genotype / allele rows
+        allele_dict[_str(arr[i, 0]).strip()] = arr[i, 1:].tolist()
+
+    return out_dir / f"{xls_path.stem}.json", _dumps_json(allele_dict)
+
 
 def build_allele_jsons(
     excel_folder: str = "KG/allele_definition",
@@ -10,90 +190,56 @@ def build_allele_jsons(
     out_dir = Path(json_folder)
     out_dir.mkdir(parents=True, exist_ok=True)
 
-    for xls_path in excel_dir.iterdir():
-        if xls_path.suffix.lower() not in {".xls", ".xlsx"}:
-            continue
+    paths = [p for p in excel_dir.iterdir() if p.suffix.lower() in {".xls", ".xlsx"}]
+    for out_path in _convert_files(_allele_json_payload, paths, out_dir):
+        print(f"✔ JSON saved: {out_path}")
 
-        df = pd.read_excel(xls_path, sheet_name=0, header=None)
-        allele_dict = {}
+import pandas as pd
+from pathlib import Path
 
-        # ---------- find rsID row ----------
-        rsid_row_idx = None
-        for i in range(len(df)):
-            first_col = str(df.iloc[i, 0]).strip()
-            if first_col.lower() == "rsid":
-                rsid_row_idx = i
-                break
 
-        if rsid_row_idx is None:
-            print(f"⚠️ No rsID row in {xls_path.name} — skipping file")
-            continue
+def _functionality_json_payload(file: Path, out_dir: Path):
+    print(f"📄 Processing: {file.name}")
+
+    rows = _read_sheet_cells(file)
+
+    # Detect GENE: row
+    gene_name = None
+    header_row = None
 
-        # ---------- find reference row (first usable row after rsID) ----------
-        ref_row_idx = None
-        for j in range(rsid_row_idx + 1, len(df)):
-            key = str(df.iloc[j, 0]).strip()
-            if not key:
-                continue
-            # skip the "<GENE> Allele" label row
-            if key.lower().endswith("allele"):
-                continue
-            ref_row_idx = j
+    for i, r in enumerate(rows):
+        cell = "" if not r or r[0] is None else str(r[0]).strip()
+        if cell.startswith("GENE:"):
+            gene_name = cell.split("GENE:")[-1].strip()
+            header_row = i + 1
             break
 
-        ref_values = df.iloc[ref_row_idx, 1:].tolist() if ref_row_idx is not None else None
-
-        # ---------- build dictionary ----------
-        for i in range(len(df)):
-            key_raw = df.iloc[i, 0]
-            if pd.isna(key_raw):
-                continue
-
-            key = str(key_raw).strip()
-            if not key:
-                continue
-
-            # skip gene title row like "Gene:CYP2C9" or "Gene:VKORC1"
-            if key.lower().startswith("gene:"):
-                continue
-
-            # skip "<GENE> Allele" label row
-            if key.lower().endswith("allele"):
-                continue
-
-            # ----- rsID row -----
-            if key.lower() == "rsid":
-                vals = df.iloc[i, 1:].tolist()
-                vals = [None if pd.isna(v) or str(v).strip() == "" else v for v in vals]
-                allele_dict[key] = vals
-                continue
-
-            row_vals = df.iloc[i, 1:].tolist()
-
-            # ----- rows AFTER rsID (genotype / allele rows) -----
-            if ref_values is not None and i >= ref_row_idx:
-                filled_vals = []
-                for col_idx, v in enumerate(row_vals):
-                    if pd.isna(v) or str(v).strip() == "":
-                        v = ref_values[col_idx]  # copy from reference row
-                    filled_vals.append(None if pd.isna(v) or str(v).strip() == "" else v)
-                allele_dict[key] = filled_vals
-                continue
-
-            # ----- rows ABOVE rsID (properties like Common Name, Effect on protein, etc.) -----
-            vals = [None if pd.isna(v) or str(v).strip() == "" else v for v in row_vals]
-            allele_dict[key] = vals
-
-        # ---------- save JSON ----------
-        out_path = out_dir / f"{xls_path.stem}.json"
-        with out_path.open("w", encoding="utf-8") as f:
-            json.dump(allele_dict, f, ensure_ascii=False, indent=2)
+    if gene_name is None:
+        print(f"⚠ Skipped — GENE not found in {file.name}")
+        return None
 
-        print(f"✔ JSON saved: {out_path}")
+    # Slice the actual table below header out of the rows already read
+    df = _frame_from_rows(rows, header_row)
 
-import pandas as pd
-import json
-from pathlib import Path
+    # Identify the allele column (first column)
+    allele_col = df.columns[0]
+
+    # Filter only star rows (boolean mask straight off the object array)
+    col = df[allele_col].to_numpy()
+    is_star = np.fromiter(
+        (isinstance(v, str) and v.startswith("*") for v in col),
+        dtype=bool,
+        count=len(col),
+    )
+    df = df[is_star]
+
+    # Build JSON structure:
+    # GENE → { "*1": {col1:val, col2:val, ...}, "*3": {...}}
+    # (a repeated star keeps its first position and the last row's values)
+    table = _clean_str_frame(df)
+    gene_dict = table.groupby(allele_col, sort=False).last().to_dict(orient="index")
+
+    return out_dir / f"{gene_name}.json", _dumps_json({gene_name: gene_dict})
 
 
 def build_functionality_json(
@@ -109,56 +255,55 @@ def build_functionality_json(
     out_dir = Path(json_output_folder)
     out_dir.mkdir(parents=True, exist_ok=True)
 
-    for file in ref_dir.glob("*_allele_functionality_reference.xlsx"):
+    files = list(ref_dir.glob("*_allele_functionality_reference.xlsx"))
+    for json_path in _convert_files(_functionality_json_payload, files, out_dir):
+        print(f"✔ JSON saved → {json_path}")
 
-        print(f"📄 Processing: {file.name}")
+    print("\n🎯 All gene functionality files converted successfully!")
 
-        raw_df = pd.read_excel(file, sheet_name=0, header=None)
+# Expected columns next to "<GENE> Diplotype", and the keys they are saved under
+_DIPLOTYPE_SOURCE_COLS = ["Activity Score", "Coded Diplotype/Phenotype Summary", "EHR Priority Notation"]
+_DIPLOTYPE_FIELDS = ["Activity Score", "Phenotype", "EHR Priority Notation"]
 
-        # Detect GENE: row
-        gene_name = None
-        header_row = None
 
-        for i in range(len(raw_df)):
-            cell = str(raw_df.iloc[i, 0]).strip()
-            if cell.startswith("GENE:"):
-                gene_name = cell.split("GENE:")[-1].strip()
-                header_row = i + 1
-                break
+def _diplotype_json_payload(path: Path, out_dir: Path):
+    print(f"📄 Processing diplotype file: {path.name}")
 
-        if gene_name is None:
-            print(f"⚠ Skipped — GENE not found in {file.name}")
-            continue
+    # column dtypes are inferred as pd.read_excel does, so a numeric column
+    # with blanks stays float and keeps its formatting ("2.0")
+    df = _frame_from_rows(_read_sheet_cells(path), 0)
 
-        # Load the actual table below header
-        df = pd.read_excel(file, sheet_name=0, header=header_row)
+    if df.empty:
+        print(f"⚠ File {path.name} is empty, skipping.")
+        return None
 
-        # Identify the allele column (first column)
-        allele_col = df.columns[0]
+    # First column header is like "CYP3A5 Diplotype"
+    diplotype_col = df.columns[0]
+    gene = str(diplotype_col).split()[0].strip()
 
-        # Filter only star rows
-        df = df[df[allele_col].astype(str).str.startswith("*")]
+    # Check required columns
+    missing = [c for c in _DIPLOTYPE_SOURCE_COLS if c not in df.columns]
+    if missing:
+        print(f"⚠ Missing columns {missing} in {path.name}, skipping.")
+        return None
 
-        # Build JSON structure:
-        # GENE → { "*1": {col1:val, col2:val, ...}, "*3": {...}}
-        gene_dict = {}
+    table = _clean_str_frame(df[[diplotype_col, *_DIPLOTYPE_SOURCE_COLS]])
 
-        for _, row in df.iterrows():
-            star = str(row[allele_col]).strip()
-            gene_dict[star] = {}
+    # diplotype -> {Activity Score, Phenotype, EHR Priority Notation};
+    # blank diplotypes are dropped, repeated ones keep their first position
+    # and the last row's values
+    columns = [table[c].tolist() for c in _DIPLOTYPE_SOURCE_COLS]
+    gene_dict = {}
+    for diplotype, *values in zip(table[diplotype_col].tolist(), *columns):
+        if not diplotype:
+            continue
+        gene_dict[diplotype] = dict(zip(_DIPLOTYPE_FIELDS, values))
 
-            for col in df.columns[1:]:
-                gene_dict[star][col] = (
-                    "" if pd.isna(row[col]) else str(row[col]).strip()
-                )
+    # Wrap in top-level gene key
+    json_obj = {gene: gene_dict}
 
-        json_path = out_dir / f"{gene_name}.json"
-        with open(json_path, "w", encoding="utf-8") as f:
-            json.dump({gene_name: gene_dict}, f, indent=2)
+    return out_dir / f"{gene}_diplotype_phenotype.json", _dumps_json(json_obj)
 
-        print(f"✔ JSON saved → {json_path}")
-
-    print("\n🎯 All gene functionality files converted successfully!")
 
 def convert_diplotype_phenotype_to_json(
     input_folder: str = "KG/diplotype-phenotype",
@@ -190,58 +335,13 @@ def convert_diplotype_phenotype_to_json(
     out_dir.mkdir(parents=True, exist_ok=True)
 
     # Process all .xls / .xlsx files in the folder
-    for path in in_dir.glob("*.xls*"):
-        print(f"📄 Processing diplotype file: {path.name}")
-
-        df = pd.read_excel(path)
-
-        if df.empty:
-            print(f"⚠ File {path.name} is empty, skipping.")
-            continue
-
-        # First column header is like "CYP3A5 Diplotype"
-        diplotype_col = df.columns[0]
-        gene = str(diplotype_col).split()[0].strip()
-
-        # Expected other columns
-        activity_col = "Activity Score"
-        summary_col = "Coded Diplotype/Phenotype Summary"
-        ehr_col = "EHR Priority Notation"
-
-        # Check required columns
-        missing = [c for c in [activity_col, summary_col, ehr_col] if c not in df.columns]
-        if missing:
-            print(f"⚠ Missing columns {missing} in {path.name}, skipping.")
-            continue
-
-        gene_dict = {}
-
-        for _, row in df.iterrows():
-            diplotype = str(row[diplotype_col]).strip()
-            if diplotype == "" or pd.isna(diplotype):
-                continue
-
-            activity_score = "" if pd.isna(row[activity_col]) else str(row[activity_col]).strip()
-            phenotype = "" if pd.isna(row[summary_col]) else str(row[summary_col]).strip()
-            ehr_priority = "" if pd.isna(row[ehr_col]) else str(row[ehr_col]).strip()
-
-            gene_dict[diplotype] = {
-                "Activity Score": activity_score,
-                "Phenotype": phenotype,
-                "EHR Priority Notation": ehr_priority
-            }
-
-        # Wrap in top-level gene key
-        json_obj = {gene: gene_dict}
-
-        out_path = out_dir / f"{gene}_diplotype_phenotype.json"
-        with out_path.open("w", encoding="utf-8") as f:
-            json.dump(json_obj, f, indent=2)
-
+    paths = list(in_dir.glob("*.xls*"))
+    for out_path in _convert_files(_diplotype_json_payload, paths, out_dir):
         print(f"✔ Saved JSON → {out_path}")
 
     print("\n🎯 Diplotype–phenotype conversion completed.")
 
-# build_allele_jsons()
-# build_functionality_json()
-convert_diplotype_phenotype_to_json()
\ No newline at end of file
+if __name__ == "__main__":
+    # build_allele_jsons()
+    # build_functionality_json()
+    convert_diplotype_phenotype_to_json()
@@ -5,8 +5,8 @@ Displays all sub-function outputs and final gene phenotypes in table format
 
 import streamlit as st
 import pandas as pd
-from pipeline import run_pgx_technical_report
-import json
+from pipeline import run_pgx_technical_report, clear_result_cache
+import orjson
 
 # Page configuration
 st.set_page_config(
@@ -48,7 +48,7 @@ st.markdown("""
         margin: 0;
     }
     h3 {
-        color: #000000;
+        color: #000000 !important;
     }
     [data-testid="stSidebar"] h3 {
         color: #ffffff !important;
@@ -64,6 +64,10 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+def _serialize_json(payload) -> bytes:
+    """Serialize results to indented JSON bytes"""
+    return orjson.dumps(payload, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS, default=str)
+
 def display_filtered_data(filtered_data):
     """Display the filtered PGX data"""
     if filtered_data is not None and not filtered_data.empty:
@@ -125,27 +129,45 @@ def display_star_functions(star_functions):
             else:
                 st.warning(f"No function data found for {gene}")
 
+def _gene_detail_row(diplotype, info):
+    """Build one row of the per-gene detail table"""
+    alleles = info.get("alleles", [])
+    allele1 = alleles[0] if len(alleles) > 0 else ""
+    allele2 = alleles[1] if len(alleles) > 1 else ""
+    functions = info.get("allele_functions", {})
+    return {
+        "Diplotype": diplotype,
+        "Allele 1": allele1,
+        "Allele 2": allele2,
+        "Phenotype": info.get("phenotype", "Unknown"),
+        "Activity Score": info.get("activity_score", ""),
+        "EHR Priority": info.get("ehr_priority", ""),
+        "Allele 1 Function": functions.get(allele1, "Unknown"),
+        "Allele 2 Function": functions.get(allele2, "Unknown"),
+    }
+
 def display_gene_phenotypes(gene_phenotypes):
     """Display final gene phenotypes in table format"""
     if gene_phenotypes:
         st.markdown('<div class="section-header">🎯 Final Gene Phenotypes</div>', unsafe_allow_html=True)
         
         # Create a summary table for all genes
-        summary_data = []
-        for gene, diplotypes in gene_phenotypes.items():
-            for diplotype, info in diplotypes.items():
-                summary_data.append({
-                    "Gene": gene,
-                    "Diplotype": diplotype,
-                    "Alleles": ", ".join(info.get("alleles", [])),
-                    "Phenotype": info.get("phenotype", "Unknown"),
-                    "Activity Score": info.get("activity_score", ""),
-                    "EHR Priority": info.get("ehr_priority", ""),
-                    "Allele Functions": ", ".join([
-                        f"{star}: {func}" 
-                        for star, func in info.get("allele_functions", {}).items()
-                    ])
-                })
+        summary_data = [
+            {
+                "Gene": gene,
+                "Diplotype": diplotype,
+                "Alleles": ", ".join(info.get("alleles", [])),
+                "Phenotype": info.get("phenotype", "Unknown"),
+                "Activity Score": info.get("activity_score", ""),
+                "EHR Priority": info.get("ehr_priority", ""),
+                "Allele Functions": ", ".join(
+                    f"{star}: {func}"
+                    for star, func in info.get("allele_functions", {}).items()
+                ),
+            }
+            for gene, diplotypes in gene_phenotypes.items()
+            for diplotype, info in diplotypes.items()
+        ]
         
         if summary_data:
             summary_df = pd.DataFrame(summary_data)
@@ -153,28 +175,13 @@ def display_gene_phenotypes(gene_phenotypes):
             
             # Display by gene in separate tables
             st.markdown("### 📊 Detailed View by Gene")
-            st.markdown('<style>h3 { color: #000000 !important; }</style>', unsafe_allow_html=True)
             for gene in sorted(gene_phenotypes.keys()):
                 st.markdown(f'<div class="gene-card"><h4 style="color: #000000;">🧬 {gene}</h4></div>', unsafe_allow_html=True)
                 
-                gene_data = []
-                for diplotype, info in gene_phenotypes[gene].items():
-                    gene_data.append({
-                        "Diplotype": diplotype,
-                        "Allele 1": info.get("alleles", [""])[0] if len(info.get("alleles", [])) > 0 else "",
-                        "Allele 2": info.get("alleles", [""])[1] if len(info.get("alleles", [])) > 1 else "",
-                        "Phenotype": info.get("phenotype", "Unknown"),
-                        "Activity Score": info.get("activity_score", ""),
-                        "EHR Priority": info.get("ehr_priority", ""),
-                        "Allele 1 Function": info.get("allele_functions", {}).get(
-                            info.get("alleles", [""])[0] if len(info.get("alleles", [])) > 0 else "", 
-                            "Unknown"
-                        ),
-                        "Allele 2 Function": info.get("allele_functions", {}).get(
-                            info.get("alleles", [""])[1] if len(info.get("alleles", [])) > 1 else "", 
-                            "Unknown"
-                        )
-                    })
+                gene_data = [
+                    _gene_detail_row(diplotype, info)
+                    for diplotype, info in gene_phenotypes[gene].items()
+                ]
                 
                 if gene_data:
                     gene_df = pd.DataFrame(gene_data)
@@ -219,6 +226,10 @@ def main():
                 st.session_state.results = None
                 st.session_state.current_sample_id = None
                 st.rerun()
+
+        # Drop cached pipeline runs (e.g. after the input files changed)
+        if st.button("♻️ Clear Cache", use_container_width=True):
+            clear_result_cache()
     
     # Main content area
     run_button = st.button("🚀 Run Analysis", type="primary", use_container_width=True)
@@ -229,7 +240,8 @@ def main():
         else:
             with st.spinner(f"Processing Sample ID: {sample_id}..."):
                 try:
-                    # Run the pipeline with all steps
+                    # Run the pipeline with all steps; it caches reports on disk,
+                    # keyed by the export and KG file mtimes
                     results = run_pgx_technical_report(sample_id.strip(), return_all_steps=True)
                     
                     if results:
@@ -276,10 +288,9 @@ def main():
         # Download button for results
         st.markdown("---")
         st.markdown("### 💾 Download Results")
-        results_json = json.dumps(results.get("gene_phenotypes"), indent=2, default=str)
         st.download_button(
             label="📥 Download Gene Phenotypes (JSON)",
-            data=results_json,
+            data=_serialize_json(results.get("gene_phenotypes")),
             file_name=f"gene_phenotypes_{sample_id}.json",
             mime="application/json"
         )
@@ -1,69 +1,248 @@
+import functools
+import hashlib
+import os
+import pickle
+import tempfile
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pandas as pd
 from pathlib import Path
-import json
-
-def filter_pgx_by_sample(sample_id: str) -> pd.DataFrame:
+from typing import Optional
+import orjson
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+_STRING_DTYPE = "string[pyarrow]"  # Arrow-backed strings, vectorized C++ kernels
+
+PGX_XLS_PATH = "data_input/08212025 PGX OA Genotyping Data (1) (1) (1).xlsx"
+
+PGX_COLUMNS = ["Gene Symbol", "NCBI SNP Reference", "Sample ID", "Call"]
+
+# StarCall instances are pickled into the on-disk report cache: bump
+# _RESULT_CACHE_VERSION whenever its fields change
+@dataclass(slots=True)
+class StarCall:
+    """One mapped genotype call, as returned by map_genotypes_to_star_alleles."""
+    snp: str
+    call: str
+    position_index: int
+    first_star: Optional[str]  # None when no allele carries the first base
+    second_star: str
+    diplotype: str
+
+def _find_header_row(first_col: pd.Series):
+    """Position of the first cell equal to "Assay Name" (stripped), or None."""
+    is_header = first_col.astype("string").str.strip().eq("Assay Name").fillna(False)
+    is_header = is_header.to_numpy(dtype=bool)
+    return int(is_header.argmax()) if is_header.any() else None
+
+# parquet schema metadata key holding the "<mtime_ns>:<size>" of the export a sidecar was built from
+_SIDECAR_SOURCE_KEY = b"pgx_source"
+
+def _parquet_sidecar(pgx_path: Path) -> Path:
+    return pgx_path.with_suffix(".parquet")
+
+def _replace_atomically(path: Path, write) -> None:
     """
-    Load 'PGX OA Genotyping.xls' (QuantStudio export) and filter rows by Sample ID.
-
-    Returns a DataFrame with columns:
-        ['Gene Symbol', 'NCBI SNP Reference', 'Sample ID', 'Call']
+    Call write(fileobj) on a fresh temp file next to path, then rename it
+    over path, so readers never see a partial file. The temp file is
+    removed if anything fails.
     """
-    pgx_xls_path = "data_input/08212025 PGX OA Genotyping Data (1) (1) (1).xlsx"
-    pgx_path = Path(pgx_xls_path)
+    f = tempfile.NamedTemporaryFile(dir=path.parent, suffix=".tmp", delete=False)
+    try:
+        with f:
+            write(f)
+        os.replace(f.name, path)
+    except BaseException:
+        Path(f.name).unlink(missing_ok=True)
+        raise
+
+def _read_pgx_table(pgx_path: Path, mtime_ns: int, size: int) -> pd.DataFrame:
+    """
+    Parse the QuantStudio export into the required columns plus
+    "_sample_key", the stripped Sample ID used for filtering.
 
-    # 1) Read entire sheet with no header (because there are metadata rows above the table)
-    # For .xls, pandas normally uses the xlrd engine automatically.
-    raw = pd.read_excel(pgx_path, sheet_name=0, header=None)
+    The trimmed table is also written to a "<name>.parquet" sidecar next to
+    the export, tagged with the export's mtime and size; while both still
+    match exactly it is read instead, so other processes skip the Excel
+    parse entirely.
+    """
+    parquet_path = _parquet_sidecar(pgx_path)
+    source = f"{mtime_ns}:{size}".encode()
+    try:
+        metadata = pq.read_schema(parquet_path).metadata or {}
+        if metadata.get(_SIDECAR_SOURCE_KEY) == source:
+            return pd.read_parquet(parquet_path)
+    except (OSError, ValueError):
+        pass  # no sidecar yet or unreadable: parse the export
+
+    # 1) Read the sheet once with no header (metadata rows sit above the table).
+    # calamine (Rust) handles .xls and .xlsx and is far faster than openpyxl/xlrd;
+    # it loads the whole sheet whatever nrows/usecols say, so everything below
+    # works off this single parse.
+    raw = pd.read_excel(pgx_path, sheet_name=0, header=None, engine="calamine")
 
     # 2) Find the header row: first row whose first cell is "Assay Name"
-    header_row_idx = None
-    for i in range(len(raw)):
-        if str(raw.iloc[i, 0]).strip() == "Assay Name":
-            header_row_idx = i
-            break
+    header_row_idx = _find_header_row(raw.iloc[:, 0]) if raw.shape[1] else None
 
     if header_row_idx is None:
         raise ValueError("Could not find header row starting with 'Assay Name' in the XLS file.")
 
-    # 3) Build the real dataframe: use that row as header
+    # 3) Locate the required columns in that row (first occurrence of each name)
     header = raw.iloc[header_row_idx].tolist()
-    df = raw.iloc[header_row_idx + 1 :].copy()  # data below header
-    df.columns = header
-    df.reset_index(drop=True, inplace=True)
-
-    # 4) Keep only required columns
-    cols = ["Gene Symbol", "NCBI SNP Reference", "Sample ID", "Call"]
-    for c in cols:
-        if c not in df.columns:
+    for c in PGX_COLUMNS:
+        if c not in header:
             raise KeyError(f"Required column '{c}' not found in XLS file.")
 
-    df = df[cols]
+    # 4) Take just those columns below the header, as strings; astype is the
+    # only copy, and it covers 4 columns instead of the whole sheet
+    df = raw.iloc[header_row_idx + 1:, [header.index(c) for c in PGX_COLUMNS]].astype(_STRING_DTYPE)
+    df.columns = PGX_COLUMNS
+    df.index = pd.RangeIndex(len(df))
+    df["_sample_key"] = df["Sample ID"].str.strip()
+
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata(
+            {**(table.schema.metadata or {}), _SIDECAR_SOURCE_KEY: source}
+        )
+        _replace_atomically(parquet_path, lambda f: pq.write_table(table, f))
+    except (OSError, ValueError, TypeError):
+        pass  # read-only folder or mixed-type column: memory cache only
+
+    return df
+
+@functools.lru_cache(maxsize=4)
+def _load_pgx_sheet(pgx_xls_path: str, mtime_ns: int, size: int):
+    """
+    Load the export once per (path, mtime, size) and keep it in memory.
+
+    Returns (df, rows_by_sample) where rows_by_sample maps each stripped
+    Sample ID to the positions of its rows, so a lookup is a dict hit
+    instead of a string compare over every row.
+    """
+    df = _read_pgx_table(Path(pgx_xls_path), mtime_ns, size)
+    rows_by_sample = df.groupby("_sample_key", sort=False).indices
+    return df, rows_by_sample
+
+def filter_pgx_by_sample(sample_id: str) -> pd.DataFrame:
+    """
+    Load 'PGX OA Genotyping.xls' (QuantStudio export) and filter rows by Sample ID.
+    The parsed sheet is cached, so repeated calls only redo the filter.
+
+    Returns a DataFrame with columns:
+        ['Gene Symbol', 'NCBI SNP Reference', 'Sample ID', 'Call']
+    """
+    stat = Path(PGX_XLS_PATH).stat()
+    df, rows_by_sample = _load_pgx_sheet(PGX_XLS_PATH, stat.st_mtime_ns, stat.st_size)
 
-    # 5) Filter by Sample ID (string-compare, stripped)
+    # 5) Filter by Sample ID (stripped), via the precomputed row positions
     sample_id_str = str(sample_id).strip()
-    df = df[df["Sample ID"].astype(str).str.strip() == sample_id_str]
+    df = df.iloc[rows_by_sample.get(sample_id_str, [])][PGX_COLUMNS]
 
     # 6) Remove duplicate wells for the same SNP+Sample (if any)
     df = df.drop_duplicates(subset=["NCBI SNP Reference", "Sample ID"])
 
     return df
 
+@functools.lru_cache(maxsize=256)
+def _read_json(path_str: str, mtime_ns: int) -> dict:
+    """Read and parse a KG JSON file once per (path, mtime)."""
+    data = Path(path_str).read_bytes()
+    return orjson.loads(data)
+
+def _load_json(path_str: str) -> dict:
+    """
+    Read and parse a KG JSON file, cached per (path, mtime) so files
+    regenerated by data_prep are picked up by a running process.
+
+    The returned dict is shared between callers, so treat it as read-only.
+    """
+    return _read_json(path_str, os.stat(path_str).st_mtime_ns)
+
+# QuantStudio failed-call markers, in the casings they usually appear in
+_FAILED_CALLS = frozenset({
+    "NOAMP", "NOCALL", "UND", "INVALID",
+    "noamp", "nocall", "und", "invalid",
+    "NoAmp", "NoCall", "Und", "Invalid",
+})
+
+# KG files the mapping steps read for each gene: (default folder, file name)
+_KG_JSON_FILES = [
+    ("KG/allele_definition/json_file", "{gene}_allele_definition_table.json"),
+    ("KG/allele_functionality/json_file", "{gene}.json"),
+    ("KG/diplotype-phenotype/json_file", "{gene}_diplotype_phenotype.json"),
+]
+
+def _preload_kg_json(genes: list, max_workers: int = 8) -> None:
+    """
+    Warm the _load_json cache for every KG file of every gene using a
+    thread pool, so the reads overlap instead of running one by one.
+    Missing files are skipped here and reported by the step that needs them.
+    """
+    def load(path_str):
+        try:
+            _load_json(path_str)
+        except FileNotFoundError:
+            pass
+
+    paths = [
+        str(Path(folder) / name.format(gene=gene))
+        for gene in genes
+        for folder, name in _KG_JSON_FILES
+    ]
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        list(ex.map(load, paths))
+
+def _allele_lookup(path_str: str):
+    """
+    Precompute per-gene lookup structures from an allele definition JSON,
+    cached per (path, mtime) like _load_json.
+
+    Returns (allele_keys, pos_of, stars_by_base):
+      - allele_keys: star allele names in table order
+      - pos_of: rsID -> column position (first occurrence)
+      - stars_by_base: one dict per position mapping str(base) to the
+        sorted indices (into allele_keys) of the stars carrying that base
+    """
+    return _build_allele_lookup(path_str, os.stat(path_str).st_mtime_ns)
+
+@functools.lru_cache(maxsize=256)
+def _build_allele_lookup(path_str: str, mtime_ns: int):
+    allele_def = _read_json(path_str, mtime_ns)
+    rsids = allele_def.get("rsID") or []
+    allele_keys = [k for k in allele_def.keys() if k.startswith("*")]
+
+    pos_of = {}
+    for i, rs in enumerate(rsids):
+        pos_of.setdefault(rs, i)
+
+    stars_by_base = []
+    for pos in range(len(rsids)):
+        groups = {}
+        for idx, star in enumerate(allele_keys):
+            groups.setdefault(str(allele_def[star][pos]), []).append(idx)
+        stars_by_base.append({b: np.array(ix, dtype=np.int32) for b, ix in groups.items()})
+    return allele_keys, pos_of, stars_by_base
+
 def get_unique_genes(filtered_df: pd.DataFrame) -> list:
     """
-    Return a list of unique gene symbols from the filtered PGX dataframe.
+    Return a sorted list of unique gene symbols from the filtered PGX dataframe.
     """
-    return sorted(filtered_df["Gene Symbol"].drop_duplicates().tolist())
+    # blank symbols (<NA>) cannot be ordered against strings by np.unique
+    return np.unique(filtered_df["Gene Symbol"].dropna().to_numpy()).tolist()
 
 def summarize_genes_with_json(
     unique_genes: list,
     filtered_df: pd.DataFrame,
     json_folder: str = "KG/allele_definition/json_file",
+    verbose: bool = False,
 ):
     """
     For each gene in unique_genes:
       - Extract all rows (SNP + Call) from filtered_df
-      - Print a small summary
+      - Print a small summary (only when verbose=True)
       - Load the corresponding JSON file from json_folder/<GENE>.json
 
     Returns:
@@ -78,16 +257,20 @@ def summarize_genes_with_json(
     json_base = Path(json_folder)
     summary = {}
 
+    # one hash-based pass instead of a boolean mask per gene
+    gene_groups = dict(list(filtered_df.groupby("Gene Symbol", sort=False)))
+    no_rows = filtered_df.iloc[:0]
+
     for gene in unique_genes:
-        gene_rows = filtered_df[filtered_df["Gene Symbol"] == gene]
+        gene_rows = gene_groups.get(gene, no_rows)
 
-        print(f"\n===== Gene: {gene} =====")
-        gene_calls = []
-        for _, row in gene_rows.iterrows():
-            snp = row["NCBI SNP Reference"]
-            call = row["Call"]
-            gene_calls.append({"snp": snp, "call": call})
-            print(f"SNP: {snp}  |  Call: {call}")
+        snps = gene_rows["NCBI SNP Reference"].to_numpy()
+        calls = gene_rows["Call"].to_numpy()
+        gene_calls = [{"snp": snp, "call": call} for snp, call in zip(snps, calls)]
+        if verbose:
+            lines = [f"\n===== Gene: {gene} ====="]
+            lines += [f"SNP: {c['snp']}  |  Call: {c['call']}" for c in gene_calls]
+            print("\n".join(lines))
 
         summary[gene] = {
             "calls": gene_calls
@@ -98,100 +281,102 @@ def summarize_genes_with_json(
 def map_genotypes_to_star_alleles(
     gene_summary: dict,
     json_folder: str = "KG/allele_definition/json_file",
+    return_stars_present: bool = False,
+    verbose: bool = False,
 ):
     """
     Custom mapping rule:
     - Find allele for second base first (e.g. 'G' in A/G)
     - Then take the closest matching allele *above it* for the first base
+
+    Each mapped call is returned as a StarCall record.
+
+    With verbose=True, each mapped call is printed (one batched print per gene).
+
+    With return_stars_present=True, also returns {gene: set of stars}
+    collected while mapping, for map_star_functions_from_json.
     """
     base_dir = Path(json_folder)
     all_results = {}
+    stars_present = {}
 
     for gene, info in gene_summary.items():
         json_path = base_dir / f"{gene}_allele_definition_table.json"
-        if not json_path.exists():
+        try:
+            allele_keys, pos_of, stars_by_base = _allele_lookup(str(json_path))
+        except FileNotFoundError:
             print(f"⚠ JSON missing for {gene}")
             continue
 
-        with json_path.open("r", encoding="utf-8") as f:
-            allele_def = json.load(f)
-
-        rsids = allele_def.get("rsID")
-        allele_keys = [k for k in allele_def.keys() if k.startswith("*")]
-
         gene_results = []
+        gene_stars = stars_present[gene] = set()
 
         for call_entry in info.get("calls", []):
             snp = call_entry["snp"]
             call = call_entry["call"]
 
-            # skip failed calls
-            if call.upper() in {"NOAMP", "NOCALL", "UND", "INVALID"}:
+            # skip failed calls; only strings that are not genotypes ("A/G")
+            # and not in a known casing need the .upper() copy
+            if call in _FAILED_CALLS or ("/" not in call and call.upper() in _FAILED_CALLS):
                 continue
 
-            if snp not in rsids:
+            pos = pos_of.get(snp)
+            if pos is None:
                 continue
 
-            pos = rsids.index(snp)
-            a1, a2 = call.replace(" ", "").split("/")
+            # fast path for plain SNP calls like "A/G"; indels and spaced
+            # calls ("A / G", "DEL/T") go through replace + split
+            if len(call) == 3 and call[1] == "/":
+                a1, a2 = call[0], call[2]
+            else:
+                a1, a2 = call.replace(" ", "").split("/")
+            by_base = stars_by_base[pos]
 
             # Step 1 → find second allele match first (a2)
-            second_star = None
-            second_idx = None
-            for idx, star in enumerate(allele_keys):
-                values = allele_def[star]
-                base = str(values[pos])
-                if base == a2:
-                    second_star = star
-                    second_idx = idx
-                    break
-
-            if second_star is None:
+            stars_a2 = by_base.get(a2)
+            if stars_a2 is None:
                 continue
-
-            # Step 2 → scan backwards to find nearest match for a1
-            first_star = None
-            for idx in range(second_idx - 1, -1, -1):
-                star = allele_keys[idx]
-                base = str(allele_def[star][pos])
-                if base == a1:
-                    first_star = star
-                    break
-
-            # If no match above, fallback to any match in list
-            if first_star is None:
-                for idx, star in enumerate(allele_keys):
-                    base = str(allele_def[star][pos])
-                    if base == a1:
-                        first_star = star
-                        break
+            second_idx = stars_a2[0]
+            second_star = allele_keys[second_idx]
+
+            # Step 2 → nearest match for a1 above it (binary search),
+            # else fall back to the first match in the list
+            stars_a1 = by_base.get(a1)
+            if stars_a1 is None:
+                first_star = None
+            else:
+                k = np.searchsorted(stars_a1, second_idx)
+                first_star = allele_keys[stars_a1[k - 1] if k else stars_a1[0]]
 
             diplotype = f"{first_star}/{second_star}"
 
-            result = {
-                "snp": snp,
-                "call": call,
-                "position_index": pos,
-                "first_star": first_star,
-                "second_star": second_star,
-                "diplotype": diplotype
-            }
-            gene_results.append(result)
+            gene_results.append(StarCall(snp, call, pos, first_star, second_star, diplotype))
+            gene_stars.update(s for s in (first_star, second_star) if s)
 
-            print(f"[{gene}] {snp} {call} → {diplotype}")
+        if verbose and gene_results:
+            print("\n".join(
+                f"[{gene}] {r.snp} {r.call} → {r.diplotype}" for r in gene_results
+            ))
 
         all_results[gene] = gene_results
 
+    if return_stars_present:
+        return all_results, stars_present
     return all_results
 
 def map_star_functions_from_json(
     star_alleles: dict,
-    json_folder: str = "KG/allele_functionality/json_file"
+    json_folder: str = "KG/allele_functionality/json_file",
+    stars_present: dict = None,
 ):
     """
     Load star allele functionality from per-gene JSON files:
       KG/allele_functionality/json_file/<GENE>.json
 
+    stars_present ({gene: set of stars}, as returned by
+    map_genotypes_to_star_alleles(..., return_stars_present=True)) skips
+    re-scanning the entries; without it the stars are collected here.
+
     Example JSON format:
       {
         "CYP3A5": {
@@ -220,27 +405,29 @@ def map_star_functions_from_json(
     for gene, entries in star_alleles.items():
         json_path = base_dir / f"{gene}.json"
 
-        if not json_path.exists():
+        # Load gene functionality JSON
+        try:
+            gene_json = _load_json(str(json_path))
+        except FileNotFoundError:
             print(f"⚠ Functionality JSON not found for {gene}: {json_path}")
             final_result[gene] = {}
             continue
 
-        # Load gene functionality JSON
-        with open(json_path, "r", encoding="utf-8") as f:
-            gene_json = json.load(f)
-
         gene_map = gene_json.get(gene, {})
         gene_result = {}
 
         # Extract star alleles found in patient's result
-        stars_present = set()
-        for entry in entries:
-            if entry.get("first_star"):
-                stars_present.add(entry["first_star"])
-            if entry.get("second_star"):
-                stars_present.add(entry["second_star"])
-
-        for star in sorted(stars_present):
+        if stars_present is not None:
+            gene_stars = stars_present.get(gene, set())
+        else:
+            gene_stars = set()
+            for entry in entries:
+                if entry.first_star:
+                    gene_stars.add(entry.first_star)
+                if entry.second_star:
+                    gene_stars.add(entry.second_star)
+
+        for star in sorted(gene_stars):
             func_info = gene_map.get(star)
 
             if isinstance(func_info, dict):
@@ -263,7 +450,7 @@ def map_diplotypes_to_phenotypes(
 ):
     """
     For each gene in star_alleles:
-      - collect unique diplotypes from entries (entry["diplotype"])
+      - collect unique diplotypes from entries (entry.diplotype)
       - load <GENE>_diplotype_phenotype.json
       - map each diplotype -> Phenotype, Activity Score, EHR Priority
       - attach star-level functions for the two stars
@@ -273,8 +460,8 @@ def map_diplotypes_to_phenotypes(
     star_alleles : dict
         e.g. {
           "CYP3A5": [
-            {"snp": "...", "call": "...", "first_star": "*1", "second_star": "*3", "diplotype": "*1/*3"},
-            {"snp": "...", "call": "...", "first_star": "*1", "second_star": "*1", "diplotype": "*1/*1"},
+            StarCall(snp="...", call="...", ..., first_star="*1", second_star="*3", diplotype="*1/*3"),
+            StarCall(snp="...", call="...", ..., first_star="*1", second_star="*1", diplotype="*1/*1"),
             ...
           ],
           "CYP2C19": [...],
@@ -334,10 +521,10 @@ def map_diplotypes_to_phenotypes(
         # --- 1) collect unique diplotypes for this gene ---
         diplotypes = set()
         for e in entries:
-            d = e.get("diplotype")
+            d = e.diplotype
             if not d:
                 # fall back to first/second_star if needed
-                s1, s2 = e.get("first_star"), e.get("second_star")
+                s1, s2 = e.first_star, e.second_star
                 if s1 and s2:
                     d = f"{s1}/{s2}"
                 else:
@@ -351,14 +538,14 @@ def map_diplotypes_to_phenotypes(
         # --- 2) load phenotype JSON for this gene ---
         phen_file = base_dir / f"{gene}_diplotype_phenotype.json"
         gene_phens = {}
-        phen_json = {}
-        if phen_file.exists():
-            with phen_file.open("r", encoding="utf-8") as f:
-                phen_json = json.load(f)
+        try:
+            phen_json = _load_json(str(phen_file))
             gene_block = phen_json.get(gene, {})
-        else:
+            source_file = phen_file.name
+        except FileNotFoundError:
             print(f"⚠ Phenotype JSON not found for {gene}: {phen_file}")
             gene_block = {}
+            source_file = None
 
         gene_func_map = star_functions.get(gene, {})
 
@@ -397,7 +584,7 @@ def map_diplotypes_to_phenotypes(
                 "phenotype": phenotype,
                 "activity_score": activity_score,
                 "ehr_priority": ehr_priority,
-                "source_file": phen_file.name if phen_file.exists() else None,
+                "source_file": source_file,
             }
 
         result[gene] = gene_phens
@@ -406,32 +593,114 @@ def map_diplotypes_to_phenotypes(
 
 sample = "EDX2508083837"
 
-def run_pgx_technical_report(sample: str, return_all_steps: bool = False):
+# on-disk store of finished reports; bump the version when the result layout changes
+_RESULT_CACHE_DIR = Path(".pgx_cache")
+_RESULT_CACHE_VERSION = 1
+
+def _kg_version() -> str:
+    """sha256 over the names and mtimes of every file in the three KG json folders."""
+    h = hashlib.sha256()
+    for folder, _ in _KG_JSON_FILES:
+        try:
+            entries = sorted((e.name, e.stat().st_mtime_ns) for e in os.scandir(folder))
+        except FileNotFoundError:
+            entries = []
+        h.update(repr((folder, entries)).encode())
+    return h.hexdigest()
+
+def _result_cache_path(sample: str) -> Path:
+    """Cache file for this sample under the current export and KG files."""
+    stat = Path(PGX_XLS_PATH).stat()
+    key = (
+        _RESULT_CACHE_VERSION,
+        str(sample).strip(),
+        stat.st_mtime_ns,
+        stat.st_size,
+        _kg_version(),
+    )
+    return _RESULT_CACHE_DIR / f"{hashlib.sha256(repr(key).encode()).hexdigest()}.pkl"
+
+def clear_result_cache() -> None:
+    """
+    Delete every report stored by run_pgx_technical_report and the parquet
+    sidecar of the export, and drop the in-process caches of the parsed
+    export and KG JSONs.
+    """
+    for path in _RESULT_CACHE_DIR.glob("*.pkl"):
+        path.unlink(missing_ok=True)
+    _parquet_sidecar(Path(PGX_XLS_PATH)).unlink(missing_ok=True)
+    _load_pgx_sheet.cache_clear()
+    _read_json.cache_clear()
+    _build_allele_lookup.cache_clear()
+
+def run_pgx_technical_report(
+    sample: str,
+    return_all_steps: bool = False,
+    verbose: bool = False,
+    use_cache: bool = True,
+):
+    """
+    Run every pipeline step for one sample.
+
+    Finished reports are pickled under .pgx_cache/, keyed by the sample, the
+    export's mtime and size and the KG files' mtimes, so a repeat run for
+    unchanged inputs is a single file read. A cached report is returned
+    without the verbose per-SNP output; use_cache=False always recomputes.
+    """
+    cache_path = _result_cache_path(sample) if use_cache else None
+    if cache_path is not None:
+        try:
+            with open(cache_path, "rb") as f:
+                steps = pickle.load(f)
+        except Exception:
+            pass  # not cached yet, or unreadable / incompatible pickle: recompute
+        else:
+            print(" Loaded cached report : ", cache_path)
+            return steps if return_all_steps else steps["gene_phenotypes"]
+
     result = filter_pgx_by_sample(sample)
 
     unique_gene_list = get_unique_genes(result)
     print(" Unique Gene List : ",unique_gene_list)
 
-    gene_summary = summarize_genes_with_json(unique_gene_list, result)
+    # read all KG JSONs for these genes up front, in parallel
+    _preload_kg_json(unique_gene_list)
+
+    gene_summary = summarize_genes_with_json(unique_gene_list, result, verbose=verbose)
     print(" Gene Summary : ",gene_summary)
 
-    star_alleles = map_genotypes_to_star_alleles(gene_summary)
+    star_alleles, stars_present = map_genotypes_to_star_alleles(
+        gene_summary, return_stars_present=True, verbose=verbose
+    )
     print(" Star Alleles : ",star_alleles)
 
-    star_functions = map_star_functions_from_json(star_alleles)
+    star_functions = map_star_functions_from_json(star_alleles, stars_present=stars_present)
     print(" Star Functions : ",star_functions)
 
     gene_phenotypes = map_diplotypes_to_phenotypes(star_alleles, star_functions)
     print(" Gene Phenotypes : ",gene_phenotypes)
-    
+
+    steps = {
+        "filtered_data": result,
+        "unique_gene_list": unique_gene_list,
+        "gene_summary": gene_summary,
+        "star_alleles": star_alleles,
+        "star_functions": star_functions,
+        "gene_phenotypes": gene_phenotypes
+    }
+
+    if cache_path is not None:
+        # unique temp file per write, so concurrent runs for one sample
+        # (Streamlit sessions share a process) never share a partial pickle
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            _replace_atomically(
+                cache_path, lambda f: pickle.dump(steps, f, protocol=pickle.HIGHEST_PROTOCOL)
+            )
+        except (OSError, pickle.PicklingError):
+            pass  # read-only working directory: results are just not persisted
+
     if return_all_steps:
-        return {
-            "filtered_data": result,
-            "unique_gene_list": unique_gene_list,
-            "gene_summary": gene_summary,
-            "star_alleles": star_alleles,
-            "star_functions": star_functions,
-            "gene_phenotypes": gene_phenotypes
-        }
-    
+        return steps
+
     return gene_phenotypes
\ No newline at end of file